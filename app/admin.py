@@ -0,0 +1,196 @@
+"""Bulk balance fixes for support.
+
+Run from the app directory with the usual .env in place:
+
+    python -m admin credit refund.csv --amount 50
+    python -m admin set balances.jsonl --tenant 1 --dry-run
+
+Input is CSV with a header row or JSONL, one user per line. Every record
+needs `tg_id`; `credit` adds `amount` (or --amount) tokens, `set`
+overwrites the balance with `requests` and clears any pending bonus.
+
+Each batch is checked and updated in its own transaction, which also
+records the run's progress in `admin_runs`. A run is identified by the
+input path, command, tenant and --amount: starting the same run again
+picks up after the last committed batch, and a finished run is refused
+unless --restart is given.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterator, Optional
+
+from sqlalchemy import bindparam, select, update
+from tqdm import tqdm
+
+from database import db_manager, create_tables
+from database.models import User, AdminRun
+
+
+users = User.__table__
+
+
+def read_records(path: str) -> Iterator[dict]:
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith(".jsonl"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def parse_record(
+    record: dict,
+    number: int,
+    field: str,
+    default: Optional[int]
+) -> dict:
+    try:
+        tg_id = int(record["tg_id"])
+        value = record.get(field)
+        value = default if value in (None, "") else int(value)
+    except (KeyError, TypeError, ValueError):
+        raise SystemExit(f"Record {number}: expected tg_id and {field}, got {record}")
+    if value is None:
+        raise SystemExit(f"Record {number}: no {field} and no --amount given")
+    return {"b_tg_id": tg_id, "b_value": value}
+
+
+def batches(records: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def run_key(args: argparse.Namespace) -> str:
+    return ":".join((
+        args.command,
+        str(args.tenant),
+        str(args.amount),
+        os.path.abspath(args.input),
+    ))
+
+
+async def start_run(args: argparse.Namespace) -> AdminRun | None:
+    async with db_manager.session_maker() as session:
+        run = await session.scalar(
+            select(AdminRun).where(AdminRun.key == run_key(args))
+        )
+        if run is None:
+            run = AdminRun(key=run_key(args), started_at=datetime.now(timezone.utc))
+            session.add(run)
+        elif args.restart:
+            run.done = 0
+            run.started_at = datetime.now(timezone.utc)
+            run.finished_at = None
+        elif run.finished_at is not None:
+            print(
+                f"This run already finished at {run.finished_at:%Y-%m-%d %H:%M}; "
+                "pass --restart to apply it again"
+            )
+            return None
+        await session.commit()
+        return run
+
+
+async def apply(args: argparse.Namespace):
+    if args.command == "credit":
+        field, default = "amount", args.amount
+        values = {"requests": users.c.requests + bindparam("b_value")}
+    else:
+        field, default = "requests", None
+        # A set balance replaces any pending bonus; otherwise
+        # expire_bonuses would later subtract it from the new value.
+        values = {
+            "requests": bindparam("b_value"),
+            "bonus_requests": 0,
+            "bonus_expires_at": None,
+        }
+    statement = (
+        update(users)
+        .where(
+            users.c.tenant_id == args.tenant,
+            users.c.tg_id == bindparam("b_tg_id")
+        )
+        .values(values)
+    )
+
+    run = None
+    if not args.dry_run:
+        await create_tables()
+        run = await start_run(args)
+        if run is None:
+            return
+    skip = run.done if run else 0
+    if skip:
+        print(f"Resuming after {skip} records")
+    records = (
+        parse_record(record, number, field, default)
+        for number, record in enumerate(read_records(args.input), start=1)
+    )
+    records = islice(records, skip, None)
+
+    updated, missing = 0, []
+    progress = tqdm(initial=skip, unit="users")
+    for batch in batches(records, args.batch_size):
+        ids = [params["b_tg_id"] for params in batch]
+        async with db_manager.session_maker() as session:
+            async with session.begin():
+                existing = set(await session.scalars(
+                    select(users.c.tg_id).where(
+                        users.c.tenant_id == args.tenant,
+                        users.c.tg_id.in_(ids)
+                    )
+                ))
+                found = [params for params in batch if params["b_tg_id"] in existing]
+                missing.extend(tg_id for tg_id in ids if tg_id not in existing)
+                if run is not None:
+                    if found:
+                        # A list of parameter sets runs as a single executemany
+                        await session.execute(statement, found)
+                    # Committed with the batch, so a resume never reapplies it
+                    await session.execute(
+                        update(AdminRun)
+                        .where(AdminRun.id == run.id)
+                        .values(done=AdminRun.done + len(batch))
+                    )
+        updated += len(found)
+        progress.update(len(batch))
+    progress.close()
+
+    if run is not None:
+        async with db_manager.session_maker() as session:
+            await session.execute(
+                update(AdminRun)
+                .where(AdminRun.id == run.id)
+                .values(finished_at=datetime.now(timezone.utc))
+            )
+            await session.commit()
+    action = "Would update" if args.dry_run else "Updated"
+    print(f"{action} {updated} users, {len(missing)} not found")
+    if missing:
+        print("Not found: " + ", ".join(map(str, missing[:50])))
+
+
+async def main():
+    parser = argparse.ArgumentParser(prog="python -m admin")
+    parser.add_argument("command", choices=["credit", "set"])
+    parser.add_argument("input", help="CSV or JSONL file")
+    parser.add_argument("--amount", type=int, help="tokens to credit when a record has no amount")
+    parser.add_argument("--tenant", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="check the input without writing")
+    parser.add_argument("--restart", action="store_true", help="start over, even if this run finished before")
+    args = parser.parse_args()
+    try:
+        await apply(args)
+    finally:
+        await db_manager.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,32 @@
-from pydantic import SecretStr
+from pydantic import BaseModel, Field, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict    
 
 
+# tokens -> price in Telegram Stars
+DEFAULT_CREDIT_PACKAGES: dict[int, int] = {
+    25: 199,
+    100: 759,
+    300: 2190,
+    1000: 6490,
+}
+
+
+class TenantSettings(BaseModel):
+    id: int
+    bot_token: SecretStr
+    tg_channel_id: int
+    tg_channel_link: str
+    provider_token: str = ""
+    admin_chat_id: int
+    credit_packages: dict[int, int] = Field(
+        default_factory=lambda: dict(DEFAULT_CREDIT_PACKAGES)
+    )
+
+    @property
+    def bot_id(self) -> int:
+        return int(self.bot_token.get_secret_value().split(":")[0])
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         case_sensitive=False,
@@ -16,6 +41,36 @@ class Settings(BaseSettings):
     tg_channel_id: int
     tg_channel_link: str
     provider_token: str
+    admin_chat_id: int = 5598199188
+    cooldown_seconds: float = 3.0
+    message_burst: int = 3
+    callback_rate: float = 2.0
+    callback_burst: int = 10
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_statement_cache_size: int = 500
+    db_busy_timeout_ms: int = 5000
+    topup_amount: int = 3
+    topup_inactive_days: int = 3
+    bonus_ttl_days: int = 2
+    trace_enabled: bool = False
+    trace_slow_ms: float = 2000
+    profile_slowest_percent: float = 5
+    # Extra branded bots served by the same process, as a JSON list of
+    # TenantSettings. The bot configured above is always tenant 0.
+    tenants: list[TenantSettings] = []
+
+    @property
+    def all_tenants(self) -> list[TenantSettings]:
+        primary = TenantSettings(
+            id=0,
+            bot_token=self.bot_token,
+            tg_channel_id=self.tg_channel_id,
+            tg_channel_link=self.tg_channel_link,
+            provider_token=self.provider_token,
+            admin_chat_id=self.admin_chat_id,
+        )
+        return [primary, *self.tenants]
        
 
 settings = Settings()
\ No newline at end of file
@@ -1,8 +1,103 @@
+from sqlalchemy import inspect, text, select, update, func, MetaData, Table
+from sqlalchemy.schema import CreateColumn, CreateTable, AddConstraint
+
 from .core import db_manager
-from .models import Base
+from .models import Base, User, Referral
+
+
+def add_missing_columns(connection) -> set[str]:
+    # create_all() never alters existing tables; new nullable or defaulted
+    # columns and their indexes are added here so deployed databases pick
+    # them up.
+    inspector = inspect(connection)
+    added = set()
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            added.add(f"{table.name}.{column.name}")
+            print(f"Column {table.name}.{column.name} added")
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    return added
+
+
+def backfill_referral_counts(connection):
+    count = (
+        select(func.count(Referral.id))
+        .where(
+            Referral.tenant_id == User.tenant_id,
+            Referral.user_id == User.tg_id
+        )
+        .scalar_subquery()
+    )
+    result = connection.execute(update(User).values(referrals_count=count))
+    print(f"Referral counts backfilled for {result.rowcount} users")
+
+
+def legacy_tg_id_unique(inspector) -> list[dict]:
+    return [
+        constraint
+        for constraint in inspector.get_unique_constraints("users")
+        if constraint["column_names"] == ["tg_id"]
+    ]
+
+
+def rebuild_sqlite_table(connection, table: Table):
+    # SQLite cannot drop constraints in place: copy the rows into a table
+    # created from the current model and swap it in.
+    metadata = MetaData()
+    for other in Base.metadata.sorted_tables:
+        # Referenced tables must be present for the foreign keys to compile
+        if other is not table:
+            other.to_metadata(metadata)
+    new_table = table.to_metadata(metadata, name=f"{table.name}_new")
+    columns = ", ".join(column.name for column in table.columns)
+    connection.execute(CreateTable(new_table))
+    connection.execute(text(
+        f"INSERT INTO {new_table.name} ({columns}) SELECT {columns} FROM {table.name}"
+    ))
+    connection.execute(text(f"DROP TABLE {table.name}"))
+    connection.execute(text(f"ALTER TABLE {new_table.name} RENAME TO {table.name}"))
+    for index in table.indexes:
+        index.create(connection)
+    print(f"Table {table.name} rebuilt")
+
+
+def upgrade_user_keys(connection):
+    # Users used to be unique by tg_id alone and referrals pointed at that
+    # key; with several bots the same Telegram account is a separate user
+    # per tenant, keyed by (tenant_id, tg_id).
+    inspector = inspect(connection)
+    legacy_constraints = legacy_tg_id_unique(inspector)
+    legacy_referrals = any(
+        foreign_key["referred_columns"] == ["tg_id"]
+        for foreign_key in inspector.get_foreign_keys("referrals")
+    )
+    if connection.dialect.name == "sqlite":
+        if legacy_constraints:
+            rebuild_sqlite_table(connection, User.__table__)
+        if legacy_referrals:
+            rebuild_sqlite_table(connection, Referral.__table__)
+    elif legacy_constraints:
+        # CASCADE also drops the referral foreign keys built on tg_id
+        for constraint in legacy_constraints:
+            connection.execute(text(
+                f'ALTER TABLE users DROP CONSTRAINT "{constraint["name"]}" CASCADE'
+            ))
+        for foreign_key in Referral.__table__.foreign_key_constraints:
+            connection.execute(AddConstraint(foreign_key))
+        print("User keys upgraded to (tenant_id, tg_id)")
 
 
 async def create_tables():
     async with db_manager.engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-        print("Tables created successfully")
\ No newline at end of file
+        added = await conn.run_sync(add_missing_columns)
+        if "users.referrals_count" in added:
+            await conn.run_sync(backfill_referral_counts)
+        await conn.run_sync(upgrade_user_keys)
+        print("Tables created successfully")
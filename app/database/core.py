@@ -1,37 +1,116 @@
 from typing import Any
 
+from sqlalchemy import event, Insert, Update, Delete
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.ext.asyncio import (
     create_async_engine, async_sessionmaker,
     AsyncSession, AsyncEngine
 )
+from sqlalchemy.orm import Session
 
 from config_reader import settings
 
 
+class RoutingSession(Session):
+    # Writes go to the writer engine, everything else to the readers.
+    # With a single engine both entries point to it.
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return self.info["writer"]
+        return self.info["reader"]
+
+
+def normalize_url(db_url: str) -> URL:
+    url = make_url(db_url)
+    if url.drivername in ("postgres", "postgresql"):
+        url = url.set(drivername="postgresql+asyncpg")
+    elif url.drivername == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.db_busy_timeout_ms}")
+    cursor.close()
+
+
 class DatabaseManager:
     def __init__(self, db_url: str, **kwargs: Any):
-        self.engine: AsyncEngine = create_async_engine(
-            db_url,
-            **kwargs
-        )
+        url = normalize_url(db_url)
+        if kwargs:
+            self.engine: AsyncEngine = create_async_engine(url, **kwargs)
+            self.read_engine: AsyncEngine = self.engine
+        elif url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+            self._create_sqlite_engines(url)
+        elif url.get_backend_name() == "postgresql":
+            self._create_postgres_engine(url)
+        else:
+            self.engine = self.read_engine = create_async_engine(url)
+
         self.session_maker: async_sessionmaker[
             AsyncSession
         ] = async_sessionmaker(
-            self.engine,
             class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            info={
+                "writer": self.engine.sync_engine,
+                "reader": self.read_engine.sync_engine,
+            },
             expire_on_commit=False,
             autoflush=False,
         )
 
+    def _create_sqlite_engines(self, url: URL):
+        # SQLite allows one writer at a time: a single pooled writer
+        # connection makes concurrent debits queue in the pool instead of
+        # failing with "database is locked", while WAL lets readers run
+        # alongside it.
+        self.engine = create_async_engine(
+            url,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=30,
+        )
+        # Every in-flight update holds a reader for the length of its
+        # OpenAI call; reader connections are cheap, so allow overflow.
+        self.read_engine = create_async_engine(
+            url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=30,
+        )
+        for engine in self.engines:
+            event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+
+    def _create_postgres_engine(self, url: URL):
+        self.engine = self.read_engine = create_async_engine(
+            url.update_query_dict({
+                "prepared_statement_cache_size": str(settings.db_statement_cache_size)
+            }),
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=30,
+            pool_recycle=1800,
+            pool_pre_ping=True,
+            connect_args={
+                "statement_cache_size": settings.db_statement_cache_size,
+                "server_settings": {"application_name": "valera_bot"},
+            },
+        )
+
+    @property
+    def engines(self) -> list[AsyncEngine]:
+        if self.read_engine is self.engine:
+            return [self.engine]
+        return [self.engine, self.read_engine]
+
     async def dispose(self):
-        await self.engine.dispose()
+        for engine in self.engines:
+            await engine.dispose()
         print('Database connection closed')
 
 
-db_manager = DatabaseManager(
-    settings.db_url,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=1800,
-)
\ No newline at end of file
+db_manager = DatabaseManager(settings.db_url)
@@ -1,7 +1,8 @@
 from __future__ import annotations
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, BigInteger, Integer, ForeignKey
+from sqlalchemy import String, BigInteger, Integer, DateTime, ForeignKeyConstraint, Index
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import mapped_column, DeclarativeBase, Mapped, relationship
 
@@ -12,21 +13,103 @@ class Base(AsyncAttrs, DeclarativeBase):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_tenant_tg_id", "tenant_id", "tg_id", unique=True),
+        # Leaderboard pages are read backwards along this index.
+        Index("ix_users_tenant_referrals", "tenant_id", "referrals_count", "tg_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    tg_id: Mapped[int] = mapped_column(BigInteger, unique=True)
+    tenant_id: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    tg_id: Mapped[int] = mapped_column(BigInteger)
     username: Mapped[Optional[str]] = mapped_column(String(64))
     name: Mapped[str] = mapped_column(String(128))
     requests: Mapped[int] = mapped_column(Integer, default=30)
+    bonus_requests: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    bonus_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    last_active_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), index=True)
+    zero_notified_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    referrals_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
-    referrals = relationship("Referral", back_populates="referrer", foreign_keys="[Referral.user_id]")
+    referrals = relationship(
+        "Referral",
+        back_populates="referrer",
+        foreign_keys="[Referral.tenant_id, Referral.user_id]",
+        viewonly=True
+    )
 
 class Referral(Base):
     __tablename__ = "referrals"
+    __table_args__ = (
+        ForeignKeyConstraint(["tenant_id", "user_id"], ["users.tenant_id", "users.tg_id"]),
+        ForeignKeyConstraint(["tenant_id", "referral_id"], ["users.tenant_id", "users.tg_id"]),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.tg_id"))  # Исправлен тип
-    referral_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.tg_id"))  # Добавлен тип и FK
+    tenant_id: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    referral_id: Mapped[int] = mapped_column(BigInteger)
 
-    referrer = relationship("User", back_populates="referrals", foreign_keys=[user_id])
-    referred_user = relationship("User", foreign_keys=[referral_id])
\ No newline at end of file
+    referrer = relationship(
+        "User",
+        back_populates="referrals",
+        foreign_keys=[tenant_id, user_id],
+        viewonly=True
+    )
+    referred_user = relationship(
+        "User",
+        foreign_keys=[tenant_id, referral_id],
+        viewonly=True
+    )
+
+
+class ProcessedUpdate(Base):
+    __tablename__ = "update_log"
+
+    tenant_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    update_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+
+class Payment(Base):
+    __tablename__ = "payments"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    charge_id: Mapped[str] = mapped_column(String(255), unique=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, index=True)
+    amount: Mapped[int] = mapped_column(Integer)
+    tokens: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class JobLock(Base):
+    __tablename__ = "job_locks"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(128))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job: Mapped[str] = mapped_column(String(64), index=True)
+    owner: Mapped[str] = mapped_column(String(128))
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    status: Mapped[str] = mapped_column(String(16), default="running")
+    rows: Mapped[Optional[int]] = mapped_column(Integer)
+    error: Mapped[Optional[str]] = mapped_column(String(512))
+
+
+class AdminRun(Base):
+    # Progress of a bulk admin run, committed together with each batch
+    __tablename__ = "admin_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(String(700), unique=True)
+    done: Mapped[int] = mapped_column(Integer, default=0)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
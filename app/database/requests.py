@@ -1,25 +1,30 @@
+from datetime import datetime, timedelta, timezone
 from typing import Optional
-from sqlalchemy import select, delete, or_
+from sqlalchemy import select, delete, update, or_, case, tuple_, bindparam
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .models import User, Referral
+from .models import User, Referral, ProcessedUpdate, Payment, JobLock, JobRun
 
 
 async def add_user(
     session: AsyncSession, 
     tg_id: int,
     name: str,
-    username: Optional[str] = None
+    username: Optional[str] = None,
+    tenant_id: int = 0
 ):
     result = await session.scalar(
-        select(User).filter(User.tg_id == tg_id)
+        select(User).filter(User.tenant_id == tenant_id, User.tg_id == tg_id)
     )
     if result:
         return result
     user = User(
+        tenant_id=tenant_id,
         tg_id=tg_id,
         username=username,
-        name=name
+        name=name,
+        last_active_at=datetime.now(timezone.utc)
     )
     session.add(user)
     await session.commit()
@@ -29,20 +34,23 @@ async def add_user(
 
 async def get_user(
     session: AsyncSession,
-    tg_id: int
+    tg_id: int,
+    tenant_id: int = 0
 ) -> (User | None):
     return await session.scalar(
-        select(User).filter(User.tg_id == tg_id)
+        select(User).filter(User.tenant_id == tenant_id, User.tg_id == tg_id)
     )
      
 
 async def get_referral(
     session: AsyncSession,
     user_id: int,
-    inviter_id: int
+    inviter_id: int,
+    tenant_id: int = 0
 ) -> (Referral | None):
     result = await session.scalar(
         select(Referral).filter(
+            Referral.tenant_id == tenant_id,
             or_(
                 Referral.user_id == user_id,
                 Referral.referral_id == inviter_id,
@@ -56,41 +64,305 @@ async def get_referral(
 async def add_referral(
     session: AsyncSession,
     user_id: int,
-    inviter_id: int
+    inviter_id: int,
+    tenant_id: int = 0
 ) -> None:
     referral = Referral(
+        tenant_id=tenant_id,
         user_id=user_id,
         referral_id=inviter_id
     )
     session.add(referral)
+    # Counted in the same transaction as the insert so the two never drift.
+    await session.execute(
+        update(User)
+        .where(User.tenant_id == tenant_id, User.tg_id == user_id)
+        .values(referrals_count=User.referrals_count + 1)
+    )
     await session.commit()
     print(f"Referral {user_id} was added")
 
 
+async def get_top_inviters(
+    session: AsyncSession,
+    tenant_id: int = 0,
+    limit: int = 10,
+    after: Optional[tuple[int, int]] = None
+) -> list[tuple[int, str, int]]:
+    # Keyset pagination: `after` is the (referrals_count, tg_id) of the
+    # last row of the previous page.
+    query = (
+        select(User.tg_id, User.name, User.referrals_count)
+        .where(User.tenant_id == tenant_id, User.referrals_count > 0)
+        .order_by(User.referrals_count.desc(), User.tg_id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(tuple_(User.referrals_count, User.tg_id) < after)
+    result = await session.execute(query)
+    return [tuple(row) for row in result]
+
+
 async def decrease_user_request(
     session: AsyncSession,
-    user_id: int
+    user_id: int,
+    tenant_id: int = 0
 ):
-    user = await session.scalar(
-        select(User).filter(User.tg_id == user_id)
+    result = await session.execute(
+        update(User)
+        .where(User.tenant_id == tenant_id, User.tg_id == user_id)
+        .values(
+            requests=User.requests - 1,
+            bonus_requests=case(
+                (User.bonus_requests > 0, User.bonus_requests - 1),
+                else_=0
+            ),
+            last_active_at=datetime.now(timezone.utc)
+        )
     )
-    if not user:
-        return
-    user.requests -= 1
     await session.commit()
+    if not result.rowcount:
+        return
     return True
 
 
 async def update_user_requests(
     session: AsyncSession,
     user_id: int,
-    quantity: int
+    quantity: int,
+    tenant_id: int = 0
 ):
-    user = await session.scalar(
-        select(User).filter(User.tg_id == user_id)
+    result = await session.execute(
+        update(User)
+        .where(User.tenant_id == tenant_id, User.tg_id == user_id)
+        .values(requests=User.requests + quantity)
     )
-    if not user:
+    await session.commit()
+    if not result.rowcount:
         return
-    user.requests += quantity
+    return True
+
+
+async def mark_update_processed(
+    session: AsyncSession,
+    update_id: int,
+    tenant_id: int = 0
+) -> bool:
+    session.add(ProcessedUpdate(
+        tenant_id=tenant_id,
+        update_id=update_id,
+        created_at=datetime.now(timezone.utc)
+    ))
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        return False
+    return True
+
+
+async def delete_processed_updates(
+    session: AsyncSession,
+    older_than: datetime
+):
+    await session.execute(
+        delete(ProcessedUpdate).where(ProcessedUpdate.created_at < older_than)
+    )
+    await session.commit()
+
+
+async def credit_payment(
+    session: AsyncSession,
+    charge_id: str,
+    user_id: int,
+    amount: int,
+    tokens: int,
+    tenant_id: int = 0
+) -> bool:
+    session.add(Payment(
+        tenant_id=tenant_id,
+        charge_id=charge_id,
+        user_id=user_id,
+        amount=amount,
+        tokens=tokens,
+        created_at=datetime.now(timezone.utc)
+    ))
+    try:
+        await session.flush()
+    except IntegrityError:
+        await session.rollback()
+        return False
+    result = await session.execute(
+        update(User)
+        .where(User.tenant_id == tenant_id, User.tg_id == user_id)
+        .values(requests=User.requests + tokens)
+    )
+    if not result.rowcount:
+        # Keep the ledger free of payments that credited nothing
+        await session.rollback()
+        raise LookupError(f"Payment {charge_id}: user {user_id} not found")
+    await session.commit()
+    print(f"Payment {charge_id} credited to {user_id}")
+    return True
+
+
+async def acquire_job_lock(
+    session: AsyncSession,
+    name: str,
+    owner: str,
+    ttl: timedelta
+) -> bool:
+    now = datetime.now(timezone.utc)
+    result = await session.execute(
+        update(JobLock)
+        .where(
+            JobLock.name == name,
+            or_(JobLock.owner == owner, JobLock.expires_at < now)
+        )
+        .values(owner=owner, expires_at=now + ttl)
+    )
+    if result.rowcount:
+        await session.commit()
+        return True
+    session.add(JobLock(name=name, owner=owner, expires_at=now + ttl))
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        return False
+    return True
+
+
+async def get_last_job_run(
+    session: AsyncSession,
+    job: str
+) -> (JobRun | None):
+    return await session.scalar(
+        select(JobRun)
+        .where(JobRun.job == job)
+        .order_by(JobRun.started_at.desc())
+        .limit(1)
+    )
+
+
+async def start_job_run(
+    session: AsyncSession,
+    job: str,
+    owner: str,
+    started_at: datetime
+) -> JobRun:
+    run = JobRun(job=job, owner=owner, started_at=started_at)
+    session.add(run)
+    await session.commit()
+    return run
+
+
+async def finish_job_run(
+    session: AsyncSession,
+    run: JobRun,
+    rows: Optional[int] = None,
+    error: Optional[str] = None
+):
+    await session.execute(
+        update(JobRun)
+        .where(JobRun.id == run.id)
+        .values(
+            finished_at=datetime.now(timezone.utc),
+            status="failed" if error else "done",
+            rows=rows,
+            error=error[:512] if error else None
+        )
+    )
+    await session.commit()
+
+
+async def grant_inactive_bonus(
+    session: AsyncSession,
+    amount: int,
+    inactive_since: datetime,
+    expires_at: datetime
+) -> int:
+    result = await session.execute(
+        update(User)
+        .where(
+            User.requests < amount,
+            # NULL: not seen since before activity was tracked
+            or_(User.last_active_at.is_(None), User.last_active_at < inactive_since),
+            User.bonus_expires_at.is_(None)
+        )
+        .values(
+            requests=User.requests + amount,
+            bonus_requests=User.bonus_requests + amount,
+            bonus_expires_at=expires_at
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def expire_bonuses(
+    session: AsyncSession,
+    now: datetime
+) -> int:
+    result = await session.execute(
+        update(User)
+        .where(User.bonus_expires_at < now)
+        .values(
+            requests=case(
+                (User.requests > User.bonus_requests, User.requests - User.bonus_requests),
+                else_=0
+            ),
+            bonus_requests=0,
+            bonus_expires_at=None
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def claim_zero_balance_users(
+    session: AsyncSession,
+    quiet_since: datetime,
+    after_id: int,
+    limit: int
+) -> list[tuple[int, int, int]]:
+    rows = list(await session.execute(
+        select(User.id, User.tenant_id, User.tg_id)
+        .where(
+            User.requests <= 0,
+            or_(User.last_active_at.is_(None), User.last_active_at < quiet_since),
+            or_(
+                User.zero_notified_at.is_(None),
+                User.zero_notified_at < User.last_active_at
+            ),
+            User.id > after_id
+        )
+        .order_by(User.id)
+        .limit(limit)
+    ))
+    if rows:
+        await session.execute(
+            update(User)
+            .where(User.id.in_([row.id for row in rows]))
+            .values(zero_notified_at=datetime.now(timezone.utc))
+        )
+        await session.commit()
+    return [tuple(row) for row in rows]
+
+
+async def release_zero_notified(
+    session: AsyncSession,
+    users: list[tuple[int, int]]
+):
+    # Reminders claimed but never delivered are claimed again next run
+    table = User.__table__
+    await session.execute(
+        update(table)
+        .where(
+            table.c.tenant_id == bindparam("b_tenant_id"),
+            table.c.tg_id == bindparam("b_tg_id")
+        )
+        .values(zero_notified_at=None),
+        [{"b_tenant_id": tenant_id, "b_tg_id": tg_id} for tenant_id, tg_id in users]
+    )
     await session.commit()
-    return True
\ No newline at end of file
@@ -1,2 +1,2 @@
-from .bot import create_bot
+from .bot import create_bot, create_bots
 from .dispatcher import create_dispatcher
\ No newline at end of file
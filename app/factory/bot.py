@@ -2,14 +2,21 @@ from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
 from aiogram.types import LinkPreviewOptions
 
-from config_reader import settings
+from config_reader import settings, TenantSettings
+from middlewares import TracingRequestMiddleware
 
 
-def create_bot() -> Bot:
-    return Bot(
-        token=settings.bot_token.get_secret_value(),
+def create_bot(tenant: TenantSettings) -> Bot:
+    bot = Bot(
+        token=tenant.bot_token.get_secret_value(),
         default=DefaultBotProperties(
             parse_mode="HTML",
             link_preview=LinkPreviewOptions(is_disabled=True)
         )
-    )
\ No newline at end of file
+    )
+    bot.session.middleware(TracingRequestMiddleware())
+    return bot
+
+
+def create_bots() -> list[Bot]:
+    return [create_bot(tenant) for tenant in settings.all_tenants]
@@ -1,16 +1,27 @@
+from html import escape
+
 from aiogram import Bot, Router, F
 from aiogram.types import CallbackQuery, LabeledPrice
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import requests
-from keyboards import get_main_kb, get_buy_credits_kb, PurchaseOptionsCD
-from config_reader import settings
+from keyboards import (
+    get_main_kb, get_buy_credits_kb, is_valid_package,
+    get_referral_kb, get_leaderboard_kb,
+    PurchaseOptionsCD, AnotherVariantCD, LeaderboardCD
+)
+from config_reader import TenantSettings
+from middlewares.throttling import RateLimiter
 from states import CommunicationSG
+from utils import MODES_BY_NAME, variant_cache, leaderboard_cache
+from .messages import read_input, run_generation, answer_variants
 
 
 router = Router()
 
+LEADERBOARD_PAGE_SIZE = 10
+
 
 @router.callback_query(F.data == "start_chat")
 async def start_chat(
@@ -63,10 +74,11 @@ async def awkward_pauses(
 @router.callback_query(F.data == "check")
 async def check_sub(
     callback: CallbackQuery,
-    bot: Bot
+    bot: Bot,
+    tenant: TenantSettings
 ):
     info = await bot.get_chat_member(
-        f"@{settings.tg_channel_link}",
+        f"@{tenant.tg_channel_link}",
         callback.from_user.id
     )
     if info.status == "left":
@@ -82,11 +94,12 @@ async def check_sub(
 @router.callback_query(F.data == "buy_credits")
 async def buy_credits(
     callback: CallbackQuery,
+    tenant: TenantSettings
 ):
     await callback.answer()
     await callback.message.answer(
         "Выбери пакет для пополнения баланса:",
-        reply_markup=get_buy_credits_kb()
+        reply_markup=get_buy_credits_kb(tenant.credit_packages)
     )
 
 
@@ -94,13 +107,21 @@ async def buy_credits(
 async def buy_credits(
     callback: CallbackQuery,
     callback_data: PurchaseOptionsCD,
+    tenant: TenantSettings
 ):
+    if not is_valid_package(
+        tenant.credit_packages,
+        callback_data.amount,
+        callback_data.tokens
+    ):
+        await callback.answer("Такого пакета нет", show_alert=True)
+        return
     await callback.answer()
     await callback.message.answer_invoice(
         f"Пакет на {callback_data.tokens} токенов",
         f"Пополнение баланса: Пакет на {callback_data.tokens} токенов",
         payload=f"{callback_data.amount}_{callback_data.tokens}",
-        provider_token=settings.provider_token,
+        provider_token=tenant.provider_token,
         currency="XTR",
         prices=[LabeledPrice(label="XTR", amount=callback_data.amount)]
     )
@@ -110,9 +131,10 @@ async def buy_credits(
 async def show_balance(
     callback: CallbackQuery,
     session: AsyncSession,
+    tenant: TenantSettings
 ):
     await callback.answer()
-    user = await requests.get_user(session, callback.from_user.id)
+    user = await requests.get_user(session, callback.from_user.id, tenant.id)
     await callback.message.answer(
         f"""
 💰 Твой баланс: {user.requests} токен(ов).
@@ -128,12 +150,138 @@ async def show_balance(
 @router.callback_query(F.data == "show_referral")
 async def show_referral(
     callback: CallbackQuery,
-    bot: Bot
+    bot: Bot,
+    session: AsyncSession,
+    tenant: TenantSettings
 ):
     await callback.answer()
-    info = await bot.get_me()
+    # Bot.me() fetches once per bot and then answers from memory
+    info = await bot.me()
+    user = await requests.get_user(session, callback.from_user.id, tenant.id)
+    invited = user.referrals_count if user else 0
     await callback.message.answer(
         "🔗 Твоя персональная реферальная ссылка:\n"
         f"https://t.me/{info.username}?start=r_{callback.from_user.id}\n\n"
-        "Пригласи друга и вы оба получите +10 токенов!"
+        f"👥 Приглашено друзей: {invited}\n\n"
+        "Пригласи друга и вы оба получите +10 токенов!",
+        reply_markup=get_referral_kb()
+    )
+
+
+@router.callback_query(LeaderboardCD.filter())
+async def show_leaderboard(
+    callback: CallbackQuery,
+    callback_data: LeaderboardCD,
+    session: AsyncSession,
+    tenant: TenantSettings
+):
+    await callback.answer()
+    after = None
+    if callback_data.count is not None and callback_data.tg_id is not None:
+        after = (callback_data.count, callback_data.tg_id)
+    rows = leaderboard_cache.get(tenant.id, after)
+    if rows is None:
+        # One extra row tells whether there is a next page
+        rows = await requests.get_top_inviters(
+            session,
+            tenant.id,
+            LEADERBOARD_PAGE_SIZE + 1,
+            after
+        )
+        leaderboard_cache.put(tenant.id, after, rows)
+    if not rows:
+        await callback.message.answer("Пока никто не пригласил друзей — стань первым!")
+        return
+
+    page = rows[:LEADERBOARD_PAGE_SIZE]
+    next_page = None
+    if len(rows) > LEADERBOARD_PAGE_SIZE:
+        last_id, _, last_count = page[-1]
+        next_page = LeaderboardCD(
+            rank=callback_data.rank + len(page),
+            count=last_count,
+            tg_id=last_id
+        )
+    lines = ["🏆 Топ пригласивших:"]
+    for rank, (_, name, count) in enumerate(page, start=callback_data.rank):
+        lines.append(f"{rank}. {escape(name)} — {count}")
+    await callback.message.answer(
+        "\n".join(lines),
+        reply_markup=get_leaderboard_kb(next_page)
+    )
+
+
+@router.callback_query(AnotherVariantCD.filter())
+async def another_variant(
+    callback: CallbackQuery,
+    callback_data: AnotherVariantCD,
+    bot: Bot,
+    session: AsyncSession,
+    tenant: TenantSettings,
+    message_limiter: RateLimiter
+):
+    mode = MODES_BY_NAME.get(callback_data.mode)
+    if mode is None:
+        await callback.answer()
+        return
+    variant = variant_cache.pop(
+        tenant.id,
+        callback.from_user.id,
+        callback_data.message_id
+    )
+    if variant is not None:
+        await callback.answer()
+        await answer_variants(
+            callback.message,
+            tenant.id,
+            callback.from_user.id,
+            callback_data.message_id,
+            mode,
+            [variant]
+        )
+        return
+
+    # A cache miss is a new paid generation, limited like a message
+    allowed, _ = message_limiter.hit((tenant.id, callback.from_user.id))
+    if not allowed:
+        await callback.answer("Не так быстро 🙂 Подожди пару секунд.")
+        return
+
+    source = getattr(callback.message, "reply_to_message", None)
+    user_input = await read_input(source, bot, mode) if source else None
+    if user_input is None:
+        await callback.answer(
+            "Не нашёл исходное сообщение, пришли его ещё раз",
+            show_alert=True
+        )
+        return
+    user = await requests.get_user(session, callback.from_user.id, tenant.id)
+    if not user or user.requests <= 0:
+        await callback.answer(
+            "У вас закончились запросы! Чтобы их пополнить, купите пакет токенов",
+            show_alert=True
+        )
+        return
+    await callback.answer()
+    variants = await run_generation(
+        tenant.id,
+        callback.from_user.id,
+        mode,
+        *user_input,
+        source_id=callback_data.message_id
+    )
+    if variants is None:
+        return
+    await answer_variants(
+        callback.message,
+        tenant.id,
+        callback.from_user.id,
+        callback_data.message_id,
+        mode,
+        variants
+    )
+    await requests.decrease_user_request(
+        session,
+        callback.from_user.id,
+        tenant.id
     )
@@ -1,28 +1,36 @@
-from aiogram import Bot, Router
+from aiogram import Bot, Router, F
 from aiogram.types import Message
-from aiogram.filters import CommandStart, CommandObject
+from aiogram.filters import Command, CommandStart, CommandObject
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import requests
 from keyboards import get_main_kb
+from utils import MODES, cache_hit_rate, metrics, tracer
+from config_reader import settings, TenantSettings
 
 
 router = Router()
 
 
+def is_tenant_admin(message: Message, tenant: TenantSettings) -> bool:
+    return message.from_user.id == tenant.admin_chat_id
+
+
 @router.message(CommandStart())
 async def start(
     message: Message, 
     bot: Bot,
     command: CommandObject,
     session: AsyncSession,
-    state: FSMContext
+    state: FSMContext,
+    tenant: TenantSettings
 ):
     await state.clear()
     user = await requests.get_user(
         session, 
-        message.from_user.id
+        message.from_user.id,
+        tenant.id
     )
     if not user:
         user = await requests.add_user(
@@ -30,6 +38,7 @@ async def start(
             message.from_user.id,
             message.from_user.first_name,
             message.from_user.username,
+            tenant.id
         )
     if command.args:
         option, value = command.args.split("_")
@@ -42,7 +51,8 @@ async def start(
                 warning_text = "Произошла ошибка. Пожалуйста, перезапустите бота командой /start"
                 inviter = await requests.get_user(
                     session,
-                    inviter_id
+                    inviter_id,
+                    tenant.id
                 )
                 if not inviter:
                     return await message.answer(warning_text)
@@ -51,6 +61,7 @@ async def start(
                     session,
                     user.tg_id,
                     inviter_id,
+                    tenant.id
                 )
                 if guest:
                     return await message.answer(warning_text)
@@ -61,6 +72,7 @@ async def start(
                     session,
                     inviter_id,
                     user.tg_id,
+                    tenant.id
                 )
                 await bot.send_message(
                     inviter.tg_id, "Вы успешно пригласили друга и получаете +10 токенов"
@@ -68,12 +80,14 @@ async def start(
                 await requests.update_user_requests(
                     session,
                     inviter.tg_id,
-                    10
+                    10,
+                    tenant.id
                 )
                 await requests.update_user_requests(
                     session,
                     user.tg_id,
-                    10
+                    10,
+                    tenant.id
                 )
                 await message.answer("Вы стали рефералом! В награду вы получаете +10 токенов")
                 return
@@ -84,4 +98,50 @@ async def start(
 Выбери ниже, что тебе интересно либо просто напиши в чат, что тебя волнует:
     """,
         reply_markup=get_main_kb()
-    )
\ No newline at end of file
+    )
+
+
+@router.message(Command("stats"), is_tenant_admin)
+async def stats(message: Message, tenant: TenantSettings):
+    if tenant.id != 0:
+        await message.answer(
+            f"OpenAI запросов: {metrics.get(f'openai.requests.tenant{tenant.id}')}\n"
+            f"Prompt cache hit rate: {cache_hit_rate(tenant_id=tenant.id):.1%}\n"
+            f"Отменено генераций: {metrics.get(f'generation.cancelled.tenant{tenant.id}')}"
+        )
+        return
+    lines = [
+        f"OpenAI запросов: {metrics.get('openai.requests')}",
+        f"Prompt cache hit rate: {cache_hit_rate():.1%}",
+        f"Отменено генераций: {metrics.get('generation.cancelled')} "
+        f"(~{metrics.get('generation.cancelled_input_tokens')} входных токенов)",
+    ]
+    for mode in MODES.values():
+        lines.append(
+            f"  {mode.name}: {metrics.get(f'openai.requests.{mode.name}')} запр., "
+            f"cache {cache_hit_rate(mode):.1%}"
+        )
+    for other in settings.all_tenants:
+        lines.append(
+            f"  бот {other.id}: {metrics.get(f'openai.requests.tenant{other.id}')} запр., "
+            f"cache {cache_hit_rate(tenant_id=other.id):.1%}"
+        )
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("trace", "profile"), F.from_user.id == settings.admin_chat_id)
+async def toggle_tracing(message: Message, command: CommandObject):
+    enable = command.args == "on"
+    if command.command == "trace":
+        tracer.enabled = enable
+        if not enable:
+            tracer.profiler.stop()
+    elif enable:
+        tracer.enabled = True
+        tracer.profiler.start()
+    else:
+        tracer.profiler.stop()
+    await message.answer(
+        f"Трассировка: {'вкл' if tracer.enabled else 'выкл'}, "
+        f"профайлер: {'вкл' if tracer.profiler.running else 'выкл'}"
+    )
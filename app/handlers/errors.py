@@ -1,12 +1,19 @@
+from typing import Optional
+
 from aiogram import Router
 from aiogram.types import ErrorEvent
 
+from config_reader import settings, TenantSettings
+
 
 router = Router(name=__name__)
 
 
 @router.error()
-async def handle_bad_request(event: ErrorEvent):
+async def handle_bad_request(
+    event: ErrorEvent,
+    tenant: Optional[TenantSettings] = None
+):
     update = event.update
     
     if update.message:
@@ -15,6 +22,7 @@ async def handle_bad_request(event: ErrorEvent):
     elif update.callback_query:
         await update.callback_query.answer()
         await update.callback_query.message.answer(text="Произошла ошибка, используйте команду /start")
-    await update.bot.send_message(chat_id=5598199188, text=f"Ошибка: {event.exception}")
+    admin_chat_id = tenant.admin_chat_id if tenant else settings.admin_chat_id
+    await update.bot.send_message(chat_id=admin_chat_id, text=f"Ошибка: {event.exception}")
 
 
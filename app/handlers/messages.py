@@ -1,130 +1,191 @@
+import asyncio
+from typing import Optional
+
 from aiogram import Bot, Router, F
-from aiogram.types import PreCheckoutQuery, Message
+from aiogram.types import PreCheckoutQuery, Message, ReplyParameters
+from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import requests
-from states import CommunicationSG
-from utils import analyze_photo, chat_with_gpt
-from config_reader import settings
+from utils import (
+    MODES, GenerationMode, generate_variants, variant_cache,
+    generation_tracker, count_tokens, metrics
+)
+from config_reader import TenantSettings
+from keyboards import is_valid_package, get_variant_kb
 
 
 router = Router()
 
 
+def parse_payload(payload: str) -> tuple[int, int] | None:
+    try:
+        amount, tokens = map(int, payload.split("_"))
+    except ValueError:
+        return None
+    return amount, tokens
+
+
 @router.pre_checkout_query()
 async def process_pre_checkout_query(
     pre_checkout_query: PreCheckoutQuery,
+    tenant: TenantSettings,
 ):
+    package = parse_payload(pre_checkout_query.invoice_payload)
+    if (
+        package is None
+        or not is_valid_package(tenant.credit_packages, *package)
+        or pre_checkout_query.currency != "XTR"
+        or pre_checkout_query.total_amount != package[0]
+    ):
+        await pre_checkout_query.answer(
+            ok=False,
+            error_message="Этот пакет больше недоступен, выбери другой в меню пополнения"
+        )
+        return
     await pre_checkout_query.answer(ok=True)
 
 
 @router.message(F.successful_payment)
 async def star_payment(
     message: Message, 
-    session: AsyncSession
+    session: AsyncSession,
+    tenant: TenantSettings
 ):
-    payload = message.successful_payment.invoice_payload
-    amount, tokens = payload.split("_")
-    await message.answer(
-        f"Платеж на сумму {amount} звезд зачислен! Вы получаете {tokens} токенов"
-    )
-    await requests.update_user_requests(
+    payment = message.successful_payment
+    package = parse_payload(payment.invoice_payload)
+    if package is None:
+        return
+    amount, tokens = package
+    # The payer may have never pressed /start in this bot
+    await requests.add_user(
         session,
         message.from_user.id,
-        int(tokens)
+        message.from_user.first_name,
+        message.from_user.username,
+        tenant.id
     )
-
-
-@router.message(CommunicationSG.correspondence)
-async def correspondence(
-    message: Message,
-    bot: Bot,
-    session: AsyncSession,
-    state: FSMContext
-):
-    if message.text:
-        result = await chat_with_gpt(message.text)
-        await message.answer(result)
-    elif message.photo:
-        await message.answer("Анализирую фото...")
-        file = await bot.get_file(message.photo[-1].file_id)
-        file_path = file.file_path
-        photo_url = f"https://api.telegram.org/file/bot{settings.bot_token.get_secret_value()}/{file_path}"
-        
-        result = await analyze_photo(photo_url, message.caption)
-        await message.answer(result)
-    await requests.decrease_user_request(
+    credited = await requests.credit_payment(
         session,
+        payment.telegram_payment_charge_id,
         message.from_user.id,
+        amount,
+        tokens,
+        tenant.id
+    )
+    if not credited:
+        return
+    await message.answer(
+        f"Платеж на сумму {amount} звезд зачислен! Вы получаете {tokens} токенов"
     )
-    
 
 
-@router.message(CommunicationSG.girl_analysis)
-async def correspondence(
+async def read_input(
     message: Message,
     bot: Bot,
-    session: AsyncSession,
-    state: FSMContext
-):
-    if message.text:
-        result = await chat_with_gpt(message.text)
-        await message.answer(result)
-    elif message.photo:
-        await message.answer("Анализирую фото...")
+    mode: GenerationMode
+) -> tuple[Optional[str], Optional[str]] | None:
+    if message.photo and mode.accepts("photo"):
         file = await bot.get_file(message.photo[-1].file_id)
-        file_path = file.file_path
-        photo_url = f"https://api.telegram.org/file/bot{settings.bot_token.get_secret_value()}/{file_path}"
-        
-        result = await analyze_photo(photo_url, message.caption)
-        await message.answer(result)
-    await requests.decrease_user_request(
-        session,
-        message.from_user.id,
+        photo_url = f"https://api.telegram.org/file/bot{bot.token}/{file.file_path}"
+        return message.caption, photo_url
+    if message.text and mode.accepts("text"):
+        return message.text, None
+    return None
+
+
+async def run_generation(
+    tenant_id: int,
+    user_id: int,
+    mode: GenerationMode,
+    text: Optional[str],
+    photo_url: Optional[str],
+    source_id: Optional[int] = None
+) -> list[str] | None:
+    # A regeneration of an older reply (source_id) is tracked on its own:
+    # it neither cancels nor is cancelled by the user's latest message.
+    if source_id is None:
+        key, supersede = (tenant_id, user_id), mode.latest_wins
+    else:
+        key, supersede = (tenant_id, user_id, source_id), False
+    task = generation_tracker.start(
+        key,
+        generate_variants(mode, text, photo_url, tenant_id=tenant_id),
+        supersede=supersede
     )
-    
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            raise
+    # Superseded by a newer message: the HTTP request was aborted and
+    # nothing is charged.
+    metrics.inc("generation.cancelled")
+    metrics.inc(f"generation.cancelled.{mode.name}")
+    metrics.inc(f"generation.cancelled.tenant{tenant_id}")
+    if text:
+        metrics.inc("generation.cancelled_input_tokens", count_tokens(text))
+    return None
 
 
-@router.message(CommunicationSG.my_analysis)
-async def correspondence(
+async def answer_variants(
     message: Message,
-    bot: Bot,
-    session: AsyncSession,
-    state: FSMContext
+    tenant_id: int,
+    user_id: int,
+    source_id: int,
+    mode: GenerationMode,
+    variants: list[str]
 ):
-    if message.text:
-        result = await chat_with_gpt(message.text)
-        await message.answer(result)
-    elif message.photo:
-        await message.answer("Анализирую фото...")
-        file = await bot.get_file(message.photo[-1].file_id)
-        file_path = file.file_path
-        photo_url = f"https://api.telegram.org/file/bot{settings.bot_token.get_secret_value()}/{file_path}"
-        
-        result = await analyze_photo(photo_url, message.caption)
-        await message.answer(result)
-    await requests.decrease_user_request(
-        session,
-        message.from_user.id,
+    variant_cache.put(tenant_id, user_id, source_id, variants[1:])
+    await message.answer(
+        variants[0],
+        reply_parameters=ReplyParameters(
+            message_id=source_id,
+            allow_sending_without_reply=True
+        ),
+        reply_markup=get_variant_kb(mode.name, source_id)
     )
-    
 
 
-@router.message(CommunicationSG.pause)
-async def correspondence(
+@router.message(StateFilter(*MODES))
+async def generation(
     message: Message,
     bot: Bot,
     session: AsyncSession,
-    state: FSMContext
+    state: FSMContext,
+    tenant: TenantSettings
 ):
-    if not message.text:
+    mode = MODES[await state.get_state()]
+    user_input = await read_input(message, bot, mode)
+    if user_input is None:
+        await message.answer(mode.input_hint)
         return
-    
-    result = await chat_with_gpt(message.text)
-    await message.answer(result)
+    text, photo_url = user_input
+    placeholder = None
+    if photo_url:
+        placeholder = await message.answer("Анализирую фото...")
+    variants = await run_generation(
+        tenant.id,
+        message.from_user.id,
+        mode,
+        text,
+        photo_url
+    )
+    if variants is None:
+        if placeholder:
+            await placeholder.edit_text("Пропускаю — отвечаю на твоё новое сообщение")
+        return
+    await answer_variants(
+        message,
+        tenant.id,
+        message.from_user.id,
+        message.message_id,
+        mode,
+        variants
+    )
     await requests.decrease_user_request(
         session,
         message.from_user.id,
+        tenant.id
     )
-    
\ No newline at end of file
@@ -1,14 +1,25 @@
+from typing import Optional
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.filters.callback_data import CallbackData
 
-from config_reader import settings
-
 
 class PurchaseOptionsCD(CallbackData, prefix="purchase"):
     amount: int 
     tokens: int = 25
 
 
+class AnotherVariantCD(CallbackData, prefix="variant"):
+    mode: str
+    message_id: int
+
+
+class LeaderboardCD(CallbackData, prefix="top"):
+    rank: int = 1
+    count: Optional[int] = None
+    tg_id: Optional[int] = None
+
+
 def get_main_kb() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton(
@@ -36,41 +47,58 @@ def get_main_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_buy_credits_kb() -> InlineKeyboardMarkup:
+def get_variant_kb(mode: str, message_id: int) -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton(
-            text="25 токенов - 199 ⭐️",
-            callback_data=PurchaseOptionsCD(
-                amount=199,
-                tokens=25
-            ).pack())],
-        [InlineKeyboardButton(
-            text="100 токенов - 759 ⭐️",
-            callback_data=PurchaseOptionsCD(
-                amount=759,
-                tokens=100
+            text="🔄 Другой вариант",
+            callback_data=AnotherVariantCD(
+                mode=mode,
+                message_id=message_id
             ).pack())],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_referral_kb() -> InlineKeyboardMarkup:
+    keyboard = [
         [InlineKeyboardButton(
-            text="300 токенов — 2190 ⭐️",
-            callback_data=PurchaseOptionsCD(
-                amount=2190,
-                tokens=300
-            ).pack())],
+            text="🏆 Топ пригласивших",
+            callback_data=LeaderboardCD().pack())],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_leaderboard_kb(next_page: Optional[LeaderboardCD]) -> InlineKeyboardMarkup:
+    keyboard = []
+    if next_page is not None:
+        keyboard.append([InlineKeyboardButton(
+            text="Дальше ➡️",
+            callback_data=next_page.pack())])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_buy_credits_kb(packages: dict[int, int]) -> InlineKeyboardMarkup:
+    keyboard = [
         [InlineKeyboardButton(
-            text="1000 токенов — 6490 ⭐️",
+            text=f"{tokens} токенов — {amount} ⭐️",
             callback_data=PurchaseOptionsCD(
-                amount=6490,
-                tokens=1000
-            ).pack())],
+                amount=amount,
+                tokens=tokens
+            ).pack())]
+        for tokens, amount in packages.items()
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_subscription_kb() -> InlineKeyboardMarkup:
+def is_valid_package(packages: dict[int, int], amount: int, tokens: int) -> bool:
+    return packages.get(tokens) == amount
+
+
+def get_subscription_kb(channel_link: str) -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton(
             text="Подписаться",
-            url=f"https://t.me/{settings.tg_channel_link}")],
+            url=f"https://t.me/{channel_link}")],
         [InlineKeyboardButton(
             text="Проверить",
             callback_data="check")],
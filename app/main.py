@@ -1,31 +1,43 @@
+import asyncio
 from contextlib import suppress
 
 from aiogram import Bot, Dispatcher
 
-from factory import create_dispatcher, create_bot
+from factory import create_dispatcher, create_bots
 from database import create_tables, db_manager
+from utils import instrument_sqlalchemy, load_tokenizer
+from scheduler import create_scheduler
 
 
-async def on_startup(bot: Bot):
+async def on_startup(bots: list[Bot], dispatcher: Dispatcher):
     await create_tables()
-    await bot.delete_webhook(drop_pending_updates=True)
+    await asyncio.to_thread(load_tokenizer)
+    for bot in bots:
+        await bot.delete_webhook(drop_pending_updates=True)
+    scheduler = create_scheduler(bots)
+    scheduler.start()
+    dispatcher["scheduler"] = scheduler
     print("Bot started")
 
 
-async def on_shutdown():
+async def on_shutdown(dispatcher: Dispatcher):
+    scheduler = dispatcher.get("scheduler")
+    if scheduler:
+        await scheduler.stop()
     await db_manager.dispose()
     print("Bot stopped")
 
 
 def main():
-    bot: Bot = create_bot()
+    instrument_sqlalchemy(*(engine.sync_engine for engine in db_manager.engines))
+    bots: list[Bot] = create_bots()
     dp: Dispatcher = create_dispatcher()
 
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
 
     dp.run_polling(
-        bot,
+        *bots,
         allowed_updates=dp.resolve_used_update_types()
     )
 
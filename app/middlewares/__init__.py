@@ -7,18 +7,29 @@ from config_reader import settings
 from .requests_counter import RequestsCounterMiddleware
 from .subscription_check import ChannelSubscriptionMiddleware
 from .db import DBMiddleware
+from .deduplication import UpdateDeduplicationMiddleware
+from .throttling import ThrottlingMiddleware
+from .tenant import TenantMiddleware
+from .tracing import TracingMiddleware, HandlerSpanMiddleware, TracingRequestMiddleware
 
 
 def setup_middlewares(dp: Dispatcher): 
+    dp.update.outer_middleware(TracingMiddleware())
+    dp.update.outer_middleware(TenantMiddleware())
+    dp.update.outer_middleware(ThrottlingMiddleware(
+        message_rate=1 / settings.cooldown_seconds,
+        message_burst=settings.message_burst,
+        callback_rate=settings.callback_rate,
+        callback_burst=settings.callback_burst,
+    ))
+    dp.update.outer_middleware(UpdateDeduplicationMiddleware(db_manager.session_maker))
     dp.callback_query.middleware(CallbackAnswerMiddleware())
     dp.message.middleware(RequestsCounterMiddleware())
-    dp.message.middleware(ChannelSubscriptionMiddleware(
-        2432026169
-    ))
+    dp.message.middleware(ChannelSubscriptionMiddleware())
     dp.message.middleware(ChatActionMiddleware())
-    dp.callback_query.middleware(ChannelSubscriptionMiddleware(
-        2432026169
-    ))
+    dp.callback_query.middleware(ChannelSubscriptionMiddleware())
+    dp.message.middleware(HandlerSpanMiddleware())
+    dp.callback_query.middleware(HandlerSpanMiddleware())
     dp.update.middleware(DBMiddleware(db_manager.session_maker))
     return dp
     
\ No newline at end of file
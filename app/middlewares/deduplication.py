@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from cachetools import TTLCache
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database import requests
+
+
+class UpdateDeduplicationMiddleware(BaseMiddleware):
+    def __init__(
+        self,
+        session_pool: async_sessionmaker,
+        window: timedelta = timedelta(hours=1),
+        local_size: int = 10_000,
+        prune_every: int = 1_000,
+    ):
+        self.session_pool = session_pool
+        self.window = window
+        self.prune_every = prune_every
+        self.inserted = 0
+        # Recent ids seen by this worker; the update_log table
+        # covers redeliveries that land on another worker or after a restart.
+        self.recent: TTLCache[tuple[int, int], bool] = TTLCache(
+            maxsize=local_size,
+            ttl=window.total_seconds()
+        )
+
+    async def __call__(self,
+                       handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update,
+                       data: Dict[str, Any]
+                       ) -> Any:
+        # update_id sequences are per bot
+        tenant_id = data['tenant'].id
+        if (tenant_id, event.update_id) in self.recent:
+            return
+        self.recent[(tenant_id, event.update_id)] = True
+
+        async with self.session_pool() as session:
+            if not await requests.mark_update_processed(
+                session, event.update_id, tenant_id
+            ):
+                return
+            self.inserted += 1
+            if self.inserted % self.prune_every == 0:
+                await requests.delete_processed_updates(
+                    session,
+                    datetime.now(timezone.utc) - self.window
+                )
+        return await handler(event, data)
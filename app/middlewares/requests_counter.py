@@ -5,6 +5,15 @@ from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import requests
+from config_reader import TenantSettings
+
+
+def is_exempt(message: Message) -> bool:
+    # Payments must be credited and /start (with or without a deep link)
+    # must register the user whatever their balance or subscription.
+    if message.successful_payment:
+        return True
+    return bool(message.text) and message.text.split()[0] == "/start"
 
 
 class RequestsCounterMiddleware(BaseMiddleware):
@@ -14,11 +23,15 @@ class RequestsCounterMiddleware(BaseMiddleware):
             event: Message,
             data: Dict[str, Any],
     ) -> Any:
+        if is_exempt(event):
+            return await handler(event, data)
         session: AsyncSession = data['session']
+        tenant: TenantSettings = data['tenant']
 
         user = await requests.get_user(
             session, 
-            event.from_user.id
+            event.from_user.id,
+            tenant.id
         )
         if not user:
             return await handler(event, data)
@@ -3,29 +3,27 @@ from typing import Callable, Dict, Any, Union
 from aiogram import Bot, BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
 
-from config_reader import settings
+from config_reader import TenantSettings
 from keyboards import get_subscription_kb
+from .requests_counter import is_exempt
 
 
 class ChannelSubscriptionMiddleware(BaseMiddleware):
-    def __init__(self, channel_id: int):
-        self.channel_id = channel_id
-
     async def __call__(
             self,
             handler: Callable[[TelegramObject, Dict[str, Any]], Any],
             event: Union[Message, CallbackQuery, TelegramObject],
             data: Dict[str, Any],
     ) -> Any:
+        if isinstance(event, Message) and is_exempt(event):
+            return await handler(event, data)
         bot: Bot = data['bot']
+        tenant: TenantSettings = data['tenant']
         
         status = await bot.get_chat_member(
-            chat_id=f"@{settings.tg_channel_link}", 
+            chat_id=f"@{tenant.tg_channel_link}", 
             user_id=event.from_user.id
         )
-        if isinstance(event, Message):
-            if event.text == "/start":
-                return await handler(event, data)
         if status.status != "left":
             return await handler(event, data)
         else:
@@ -35,11 +33,11 @@ class ChannelSubscriptionMiddleware(BaseMiddleware):
                 else:
                     await event.answer()
                     return await event.message.answer(
-                        f"Перед тем как я тебе помогу, подпишись на мой канал и мы продолжим @{settings.tg_channel_link}",
-                        reply_markup=get_subscription_kb()
+                        f"Перед тем как я тебе помогу, подпишись на мой канал и мы продолжим @{tenant.tg_channel_link}",
+                        reply_markup=get_subscription_kb(tenant.tg_channel_link)
                     )
             return await event.answer(
-                f"Перед тем как я тебе помогу, подпишись на мой канал и мы продолжим @{settings.tg_channel_link}",
-                reply_markup=get_subscription_kb()
+                f"Перед тем как я тебе помогу, подпишись на мой канал и мы продолжим @{tenant.tg_channel_link}",
+                reply_markup=get_subscription_kb(tenant.tg_channel_link)
             )
  
\ No newline at end of file
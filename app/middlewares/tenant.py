@@ -0,0 +1,16 @@
+from typing import Awaitable, Callable, Dict, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from tenants import get_tenant
+
+
+class TenantMiddleware(BaseMiddleware):
+    async def __call__(self,
+                       handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update,
+                       data: Dict[str, Any]
+                       ) -> Any:
+        data['tenant'] = get_tenant(data['bot'])
+        return await handler(event, data)
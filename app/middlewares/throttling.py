@@ -0,0 +1,85 @@
+import time
+from typing import Awaitable, Callable, Dict, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from cachetools import TTLCache
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "warned")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.warned = False
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int, maxsize: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        # An idle bucket refills completely after burst / rate seconds,
+        # so evicting it then is indistinguishable from keeping it.
+        self.buckets: TTLCache[tuple[int, int], TokenBucket] = TTLCache(
+            maxsize=maxsize,
+            ttl=burst / rate
+        )
+
+    def hit(self, key: tuple[int, int]) -> tuple[bool, bool]:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.burst, now)
+        else:
+            bucket.tokens = min(
+                self.burst,
+                bucket.tokens + (now - bucket.updated) * self.rate
+            )
+            bucket.updated = now
+        self.buckets[key] = bucket
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.warned = False
+            return True, False
+        warn = not bucket.warned
+        bucket.warned = True
+        return False, warn
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(
+        self,
+        message_rate: float,
+        message_burst: int,
+        callback_rate: float,
+        callback_burst: int,
+    ):
+        self.messages = RateLimiter(message_rate, message_burst)
+        self.callbacks = RateLimiter(callback_rate, callback_burst)
+
+    async def __call__(self,
+                       handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update,
+                       data: Dict[str, Any]
+                       ) -> Any:
+        # Handlers that start a paid generation from a callback charge the
+        # message limiter themselves
+        data['message_limiter'] = self.messages
+        if event.message and not event.message.successful_payment:
+            limiter, user = self.messages, event.message.from_user
+        elif event.callback_query:
+            limiter, user = self.callbacks, event.callback_query.from_user
+        else:
+            return await handler(event, data)
+        if user is None:
+            return await handler(event, data)
+
+        allowed, warn = limiter.hit((data['tenant'].id, user.id))
+        if allowed:
+            return await handler(event, data)
+        if warn:
+            if event.callback_query:
+                await event.callback_query.answer("Не так быстро 🙂")
+            else:
+                await event.message.answer("Не так быстро 🙂 Подожди пару секунд и пришли снова.")
@@ -0,0 +1,49 @@
+from typing import Awaitable, Callable, Dict, Any
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware, NextRequestMiddlewareType
+)
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Update, TelegramObject
+
+from utils import tracer, span
+
+
+class TracingMiddleware(BaseMiddleware):
+    async def __call__(self,
+                       handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update,
+                       data: Dict[str, Any]
+                       ) -> Any:
+        if not tracer.enabled:
+            return await handler(event, data)
+        root, token = tracer.begin(f"update {event.update_id} {event.event_type}")
+        try:
+            return await handler(event, data)
+        finally:
+            tracer.end(root, token)
+
+
+class HandlerSpanMiddleware(BaseMiddleware):
+    async def __call__(self,
+                       handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject,
+                       data: Dict[str, Any]
+                       ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "handler"
+        with span(f"handler {name}"):
+            return await handler(event, data)
+
+
+class TracingRequestMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ):
+        with span(f"tg.{method.__api_method__}"):
+            return await make_request(bot, method)
@@ -0,0 +1,18 @@
+from aiogram import Bot
+
+from database import db_manager
+from tenants import get_tenant
+from .core import Scheduler
+from .sender import RateLimitedSender
+from .jobs import topup_inactive_users, expire_bonuses, remind_zero_balance
+
+
+def create_scheduler(bots: list[Bot]) -> Scheduler:
+    scheduler = Scheduler(
+        db_manager.session_maker,
+        RateLimitedSender({get_tenant(bot).id: bot for bot in bots})
+    )
+    scheduler.add_job("topup_inactive_users", "0 9 * * *", topup_inactive_users)
+    scheduler.add_job("expire_bonuses", "*/15 * * * *", expire_bonuses)
+    scheduler.add_job("remind_zero_balance", "0 * * * *", remind_zero_balance)
+    return scheduler
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import socket
+import uuid
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import requests
+from .cron import CronSchedule
+from .sender import RateLimitedSender
+
+
+JobFunc = Callable[[AsyncSession, RateLimitedSender], Awaitable[int]]
+
+
+@dataclass
+class Job:
+    name: str
+    schedule: CronSchedule
+    func: JobFunc
+
+
+class Scheduler:
+    def __init__(
+        self,
+        session_pool: async_sessionmaker,
+        sender: RateLimitedSender,
+        tick: float = 30,
+        lock_ttl: timedelta = timedelta(seconds=90),
+    ):
+        self.session_pool = session_pool
+        self.sender = sender
+        self.tick = tick
+        self.lock_ttl = lock_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs: list[Job] = []
+        self.started_at = datetime.now(timezone.utc)
+        self.task: asyncio.Task | None = None
+
+    def add_job(self, name: str, cron: str, func: JobFunc):
+        self.jobs.append(Job(name, CronSchedule(cron), func))
+
+    def start(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.sender.start()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Waiting for the cancelled tick lets a running job roll back and
+        # return its connection before the engines are disposed.
+        if self.task:
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+        # Only zero-balance reminders go through the sender
+        pending = await self.sender.stop()
+        if pending:
+            async with self.session_pool() as session:
+                await requests.release_zero_notified(
+                    session,
+                    [(tenant_id, chat_id) for tenant_id, chat_id, _ in pending]
+                )
+            print(f"Released {len(pending)} undelivered reminders")
+
+    async def _run(self):
+        while True:
+            try:
+                await self._tick()
+            except Exception as error:
+                print(f"Scheduler tick failed: {error}")
+            await asyncio.sleep(self.tick)
+
+    async def _hold_lock(self) -> bool:
+        async with self.session_pool() as session:
+            return await requests.acquire_job_lock(
+                session, "scheduler", self.owner, self.lock_ttl
+            )
+
+    async def _tick(self):
+        # The lease is renewed before every job, so a long job cannot let
+        # it lapse while the following jobs are still queued here.
+        for job in self.jobs:
+            if not await self._hold_lock():
+                return
+            await self._run_if_due(job)
+
+    async def _run_if_due(self, job: Job):
+        now = datetime.now(timezone.utc)
+        async with self.session_pool() as session:
+            # Due times come from the shared run history, so a new leader
+            # neither repeats nor skips the previous leader's runs.
+            last_run = await requests.get_last_job_run(session, job.name)
+            since = last_run.started_at if last_run else self.started_at
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            if job.schedule.next_after(since) > now:
+                return
+            run = await requests.start_job_run(session, job.name, self.owner, now)
+            try:
+                rows = await job.func(session, self.sender)
+            except Exception as error:
+                await session.rollback()
+                await requests.finish_job_run(session, run, error=repr(error))
+                print(f"Job {job.name} failed: {error}")
+                return
+            await requests.finish_job_run(session, run, rows=rows)
+            print(f"Job {job.name} done, {rows} rows")
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+
+FIELD_RANGES = (
+    (0, 59),   # minute
+    (0, 23),   # hour
+    (1, 31),   # day of month
+    (1, 12),   # month
+    (0, 6),    # day of week, 0 = Sunday
+)
+
+
+def parse_field(field: str, low: int, high: int) -> set[int]:
+    values = set()
+    for part in field.split(","):
+        expression, _, step = part.partition("/")
+        if expression == "*":
+            start, end = low, high
+        elif "-" in expression:
+            start, end = map(int, expression.split("-"))
+        elif step:
+            # "a/step" runs from a to the end of the range
+            start, end = int(expression), high
+        else:
+            start = end = int(expression)
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field out of range: {part}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+
+class CronSchedule:
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields, got: {expression}")
+        self.expression = expression
+        (
+            self.minutes, self.hours, self.days,
+            self.months, self.weekdays
+        ) = (
+            parse_field(field, low, high)
+            for field, (low, high) in zip(fields, FIELD_RANGES)
+        )
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: when both day fields are restricted, either matches.
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression never fires: {self.expression}")
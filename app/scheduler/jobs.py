@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config_reader import settings
+from database import requests
+from .sender import RateLimitedSender
+
+
+async def topup_inactive_users(
+    session: AsyncSession,
+    sender: RateLimitedSender
+) -> int:
+    now = datetime.now(timezone.utc)
+    return await requests.grant_inactive_bonus(
+        session,
+        settings.topup_amount,
+        inactive_since=now - timedelta(days=settings.topup_inactive_days),
+        expires_at=now + timedelta(days=settings.bonus_ttl_days)
+    )
+
+
+async def expire_bonuses(
+    session: AsyncSession,
+    sender: RateLimitedSender
+) -> int:
+    return await requests.expire_bonuses(session, datetime.now(timezone.utc))
+
+
+async def remind_zero_balance(
+    session: AsyncSession,
+    sender: RateLimitedSender,
+    batch_size: int = 500
+) -> int:
+    quiet_since = datetime.now(timezone.utc) - timedelta(hours=1)
+    after_id, total = 0, 0
+    while True:
+        # Claim only what the queue can hold; the rest waits for the next run
+        if sender.free_slots < batch_size:
+            return total
+        users = await requests.claim_zero_balance_users(
+            session,
+            quiet_since,
+            after_id,
+            batch_size
+        )
+        if not users:
+            return total
+        for _, tenant_id, tg_id in users:
+            sender.send(
+                tenant_id,
+                tg_id,
+                "У тебя закончились токены 😔 Пополни баланс в меню или пригласи друга — "
+                "и я снова помогу с перепиской!"
+            )
+        total += len(users)
+        after_id = users[-1][0]
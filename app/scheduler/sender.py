@@ -0,0 +1,72 @@
+import asyncio
+from contextlib import suppress
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter, TelegramBadRequest
+
+
+class RateLimitedSender:
+    def __init__(
+        self,
+        bots: dict[int, Bot],
+        rate: float = 25,
+        maxsize: int = 10_000
+    ):
+        # bots are keyed by tenant id
+        self.bots = bots
+        self.interval = 1 / rate
+        self.queue: asyncio.Queue[tuple[int, int, str]] = asyncio.Queue(maxsize=maxsize)
+        self.task: Optional[asyncio.Task] = None
+        # Taken off the queue but not yet delivered
+        self.current: Optional[tuple[int, int, str]] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> list[tuple[int, int, str]]:
+        if self.task:
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+        pending = [self.current] if self.current else []
+        self.current = None
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        return pending
+
+    @property
+    def free_slots(self) -> int:
+        return self.queue.maxsize - self.queue.qsize()
+
+    def send(self, tenant_id: int, chat_id: int, text: str) -> bool:
+        # Never blocks: jobs check free_slots before claiming recipients
+        try:
+            self.queue.put_nowait((tenant_id, chat_id, text))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _run(self):
+        while True:
+            self.current = await self.queue.get()
+            tenant_id, chat_id, text = self.current
+            bot = self.bots.get(tenant_id)
+            if bot is not None:
+                try:
+                    await self._deliver(bot, chat_id, text)
+                except Exception as error:
+                    print(f"Failed to notify {chat_id}: {error}")
+            self.current = None
+            await asyncio.sleep(self.interval)
+
+    async def _deliver(self, bot: Bot, chat_id: int, text: str):
+        try:
+            await bot.send_message(chat_id, text)
+        except TelegramRetryAfter as error:
+            await asyncio.sleep(error.retry_after)
+            await bot.send_message(chat_id, text)
+        except (TelegramForbiddenError, TelegramBadRequest):
+            # Blocked the bot or deleted the chat: nothing to deliver.
+            pass
@@ -0,0 +1,18 @@
+from aiogram import Bot
+
+from config_reader import settings, TenantSettings
+
+
+TENANTS: dict[int, TenantSettings] = {
+    tenant.id: tenant for tenant in settings.all_tenants
+}
+TENANTS_BY_BOT_ID: dict[int, TenantSettings] = {
+    tenant.bot_id: tenant for tenant in TENANTS.values()
+}
+
+if len(TENANTS) != len(settings.all_tenants):
+    raise ValueError("Tenant ids must be unique, id 0 is the primary bot")
+
+
+def get_tenant(bot: Bot) -> TenantSettings:
+    return TENANTS_BY_BOT_ID[bot.id]
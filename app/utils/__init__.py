@@ -1 +1,9 @@
-from .api import chat_with_gpt, analyze_photo
\ No newline at end of file
+from .api import (
+    generate_variants, count_tokens, cache_hit_rate, load_tokenizer
+)
+from .modes import GenerationMode, MODES, MODES_BY_NAME
+from .metrics import metrics
+from .variants import variant_cache
+from .leaderboard import leaderboard_cache
+from .tasks import generation_tracker
+from .tracing import tracer, span, instrument_sqlalchemy
@@ -1,85 +1,124 @@
+from typing import Any, Optional
+
+import tiktoken
 from openai import AsyncOpenAI
+from openai.types import CompletionUsage
+
 from config_reader import settings
+from .modes import BASE_PROMPT, GenerationMode
+from .metrics import metrics
+from .tracing import span
 
 
 client = AsyncOpenAI(
     api_key=settings.openai_api_key.get_secret_value(),
 )
 
-SYSTEM_PROMPT = (
-    "Ты — Валера, тренер по соблазнению и общению с девушками. "
-    "Твоя основная задача: помочь мне соблазнить девушку, понравиться ей и наладить лёгкий, классный вайб общения.\n\n"
-    "Основные сценарии работы:\n"
-    "1. Если я присылаю переписку (текст или скрины):\n"
-    "   - Дай краткий анализ её ответов (о чём они говорят, насколько она заинтересована, есть ли намёки).\n"
-    "   - Подготовь 2–3 варианта ответов, объясни почему каждый вариант работает.\n"
-    "   - Добавь комментарии, как развивать разговор дальше.\n\n"
-    "2. Если я присылаю анкету девушки:\n"
-    "   - Проанализируй её, расскажи, какая у неё личность, интересы, стиль общения.\n"
-    "   - Подскажи, какой подход лучше использовать, чтобы вызвать интерес и сблизиться.\n\n"
-    "3. Если я присылаю свою анкету:\n"
-    "   - Дай подробный разбор (что хорошо, что плохо).\n"
-    "   - Поставь оценку по шкале от 1 до 10.\n"
-    "   - Скажи, что улучшить, чтобы анкета сильнее цепляла девушек.\n\n"
-    "4. Если я прошу темы для разговора:\n"
-    "   - Подкинь лёгкие, флиртующие и интересные темы для онлайн или оффлайн общения.\n"
-    "   - Помоги закрыть неловкие паузы, создай правильный вайб.\n\n"
-    "Правила общения:\n"
-    "- Никогда не выходи из роли Валеры.\n"
-    "- Не пиши приветствий (мы уже поздоровались).\n"
-    "- Всегда отвечай в формате обычного сообщения, без лишних формальностей.\n"
-    "- Общайся по‑дружески, по‑свойски, с лёгким налётом уверенности и дерзости.\n"
-    "- Если информации недостаточно — задавай уточняющий вопрос.\n"
-    "- При анализе фото тоже делай выводы.\n"
-    "- Отвечай структурировано: сначала анализ, потом варианты и комментарии."
-)
 
+# Conservative estimate for Russian text, used when the tokenizer is missing
+CHARS_PER_TOKEN = 3
+
+_encoding: Optional[tiktoken.Encoding] = None
+
+
+def load_tokenizer() -> bool:
+    # The first load downloads the BPE file with a blocking request, so it
+    # runs once at startup in a thread; until then, or if it fails, token
+    # counts fall back to a character estimate.
+    global _encoding
+    try:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Tokenizer unavailable, using character limits: {e}")
+        return False
+    return True
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(_encoding.encode(text))
+
+
+def fit_input(text: str, max_tokens: int) -> str:
+    if _encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = _encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return _encoding.decode(tokens[:max_tokens])
 
-async def chat_with_gpt(
-    text: str, 
+
+def build_messages(
+    mode: GenerationMode,
+    text: Optional[str] = None,
+    image_url: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    # Static instructions first, then the mode block, then user content:
+    # the leading messages are byte-identical across calls of a mode, so
+    # the provider can serve them from its prompt cache.
+    messages = [
+        {"role": "system", "content": BASE_PROMPT},
+        {"role": "system", "content": mode.prompt},
+    ]
+    if text:
+        text = fit_input(text, mode.max_input_tokens)
+    if image_url:
+        content = [{"type": "image_url", "image_url": {"url": image_url}}]
+        if text:
+            content.insert(0, {"type": "text", "text": text})
+        messages.append({"role": "user", "content": content})
+    else:
+        messages.append({"role": "user", "content": text})
+    return messages
+
+
+def record_usage(
+    mode: GenerationMode,
+    usage: Optional[CompletionUsage],
+    tenant_id: int = 0
 ):
-    messages = [{
-        "role": "system",
-        "content": SYSTEM_PROMPT
-    }]
-    messages.append({"role": "user", "content": text})
-
-    response = await client.chat.completions.create(
-        messages=messages, model="gpt-4.1-mini", 
-    )
-    
-    return response.choices[0].message.content.strip()
-
-
-async def analyze_photo(image_url: str, caption: str = None):
-    response = await client.responses.create(
-        model="gpt-4.1-mini",
-        input=[{
-            "role": "assistant",
-            "content": [
-                {"type": "reasoning_text", "text": caption if caption else SYSTEM_PROMPT},
-                {
-                    "type": "input_image",
-                    "image_url": image_url
-                },
-            ]
-        }]
+    if usage is None:
+        return
+    details = usage.prompt_tokens_details
+    cached_tokens = (details.cached_tokens or 0) if details else 0
+    for suffix in ("", f".{mode.name}", f".tenant{tenant_id}"):
+        metrics.inc(f"openai.requests{suffix}")
+        metrics.inc(f"openai.prompt_tokens{suffix}", usage.prompt_tokens)
+        metrics.inc(f"openai.cached_tokens{suffix}", cached_tokens)
+
+
+def cache_hit_rate(
+    mode: Optional[GenerationMode] = None,
+    tenant_id: Optional[int] = None
+) -> float:
+    suffix = ""
+    if mode:
+        suffix = f".{mode.name}"
+    elif tenant_id is not None:
+        suffix = f".tenant{tenant_id}"
+    return metrics.ratio(
+        f"openai.cached_tokens{suffix}",
+        f"openai.prompt_tokens{suffix}"
     )
-    # response = await client.chat.completions.create(
-    #     messages=[{
-    #         "role": "system",
-    #         "content": [
-    #             {"type": "text", "text": caption if caption else SYSTEM_PROMPT},
-    #             {
-    #                 "type": "image_url",
-    #                 "image_url": {
-    #                     "url": image_url,
-    #                 }
-    #             },
-    #         ],
-    #     }],
-    #     model="gpt-4-vision-preview",
-    # )
-
-    # return response.choices[0].message.content
-    return response.output_text
+
+
+async def generate_variants(
+    mode: GenerationMode,
+    text: Optional[str] = None,
+    image_url: Optional[str] = None,
+    n: Optional[int] = None,
+    tenant_id: int = 0,
+) -> list[str]:
+    with span(f"openai.{mode.name}"):
+        response = await client.chat.completions.create(
+            messages=build_messages(mode, text, image_url),
+            model=mode.model,
+            max_tokens=mode.max_tokens,
+            temperature=mode.temperature,
+            n=n or mode.variants,
+            prompt_cache_key=f"valera-{mode.name}",
+        )
+    record_usage(mode, response.usage, tenant_id)
+    return [choice.message.content.strip() for choice in response.choices]
+
@@ -0,0 +1,30 @@
+from typing import Optional
+
+from cachetools import TTLCache
+
+
+class LeaderboardCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        # Keyed by tenant and page cursor; a short TTL keeps the board
+        # close to live while popular pages are served from memory.
+        self.pages: TTLCache[
+            tuple[int, Optional[tuple[int, int]]], list[tuple[int, str, int]]
+        ] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(
+        self,
+        tenant_id: int,
+        after: Optional[tuple[int, int]]
+    ) -> Optional[list[tuple[int, str, int]]]:
+        return self.pages.get((tenant_id, after))
+
+    def put(
+        self,
+        tenant_id: int,
+        after: Optional[tuple[int, int]],
+        rows: list[tuple[int, str, int]]
+    ):
+        self.pages[(tenant_id, after)] = rows
+
+
+leaderboard_cache = LeaderboardCache()
@@ -0,0 +1,21 @@
+from collections import Counter
+
+
+class Metrics:
+    def __init__(self):
+        self.counters: Counter[str] = Counter()
+
+    def inc(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def get(self, name: str) -> int:
+        return self.counters[name]
+
+    def ratio(self, part: str, total: str) -> float:
+        denominator = self.counters[total]
+        if not denominator:
+            return 0.0
+        return self.counters[part] / denominator
+
+
+metrics = Metrics()
@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+
+from states import CommunicationSG
+
+
+BASE_PROMPT = (
+    "Ты — Валера, тренер по соблазнению и общению с девушками. "
+    "Помогаешь понравиться девушке и наладить лёгкий, классный вайб общения.\n\n"
+    "Правила общения:\n"
+    "- Никогда не выходи из роли Валеры.\n"
+    "- Не пиши приветствий (мы уже поздоровались).\n"
+    "- Отвечай обычным сообщением, по‑дружески, с лёгкой уверенностью и дерзостью.\n"
+    "- Если информации недостаточно — задай уточняющий вопрос.\n"
+    "- По фото тоже делай выводы."
+)
+
+
+@dataclass(frozen=True)
+class GenerationMode:
+    name: str
+    prompt: str
+    model: str = "gpt-4.1-mini"
+    max_tokens: int = 800
+    temperature: float = 0.8
+    input_types: frozenset[str] = frozenset({"text", "photo"})
+    max_input_tokens: int = 3000
+    input_hint: str = "Пришли текст или фото."
+    variants: int = 1
+    latest_wins: bool = False
+
+    def accepts(self, input_type: str) -> bool:
+        return input_type in self.input_types
+
+
+CORRESPONDENCE = GenerationMode(
+    name="correspondence",
+    prompt=(
+        "Я присылаю переписку (текст или скрины):\n"
+        "- Кратко проанализируй её ответы: о чём они, насколько она заинтересована, есть ли намёки.\n"
+        "- Предложи один вариант ответа и объясни, почему он работает.\n"
+        "- Подскажи, как развивать разговор дальше."
+    ),
+    # Alternatives come from extra choices (variants), so each choice
+    # carries a single suggestion and a smaller output budget.
+    max_tokens=500,
+    temperature=0.9,
+    max_input_tokens=4000,
+    input_hint="Пришли переписку текстом или скриншотом.",
+    variants=3,
+    latest_wins=True,
+)
+
+GIRL_ANALYSIS = GenerationMode(
+    name="girl_analysis",
+    prompt=(
+        "Я присылаю анкету девушки:\n"
+        "- Расскажи, какая у неё личность, интересы и стиль общения.\n"
+        "- Подскажи подход, который вызовет интерес, и пример первого сообщения."
+    ),
+    max_tokens=500,
+    max_input_tokens=2000,
+    input_hint="Пришли анкету девушки текстом или фото.",
+    variants=2,
+    latest_wins=True,
+)
+
+MY_ANALYSIS = GenerationMode(
+    name="my_analysis",
+    prompt=(
+        "Я присылаю свою анкету:\n"
+        "- Разбери, что хорошо и что плохо.\n"
+        "- Поставь оценку от 1 до 10.\n"
+        "- Скажи, что улучшить, чтобы анкета сильнее цепляла девушек."
+    ),
+    max_tokens=700,
+    temperature=0.7,
+    max_input_tokens=2000,
+    input_hint="Пришли свою анкету текстом или фото.",
+    latest_wins=True,
+)
+
+PAUSE = GenerationMode(
+    name="pause",
+    prompt=(
+        "Я описываю ситуацию и прошу темы для разговора. "
+        "Дай 3 лёгкие, флиртующие темы одной строкой каждая, без длинных пояснений."
+    ),
+    max_tokens=150,
+    temperature=1.0,
+    input_types=frozenset({"text"}),
+    max_input_tokens=500,
+    input_hint="Опиши ситуацию текстом: где вы и о чём говорили.",
+    variants=3,
+    latest_wins=True,
+)
+
+
+MODES_BY_NAME: dict[str, GenerationMode] = {
+    mode.name: mode
+    for mode in (CORRESPONDENCE, GIRL_ANALYSIS, MY_ANALYSIS, PAUSE)
+}
+
+MODES: dict[str, GenerationMode] = {
+    CommunicationSG.correspondence.state: CORRESPONDENCE,
+    CommunicationSG.girl_analysis.state: GIRL_ANALYSIS,
+    CommunicationSG.my_analysis.state: MY_ANALYSIS,
+    CommunicationSG.pause.state: PAUSE,
+}
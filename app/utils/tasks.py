@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Coroutine, TypeVar
+
+
+T = TypeVar("T")
+
+
+class GenerationTracker:
+    def __init__(self):
+        # Only in-flight tasks are kept; finished ones remove themselves.
+        # Keys are (tenant_id, user_id) for chat input, or with a source
+        # message id appended for regenerations of an older reply.
+        self.running: dict[tuple[int, ...], asyncio.Task] = {}
+
+    def start(
+        self,
+        user_key: tuple[int, ...],
+        coro: Coroutine[Any, Any, T],
+        supersede: bool = False
+    ) -> asyncio.Task[T]:
+        previous = self.running.get(user_key)
+        if supersede and previous and not previous.done():
+            previous.cancel()
+        task = asyncio.create_task(coro)
+        self.running[user_key] = task
+        task.add_done_callback(lambda done: self._forget(user_key, done))
+        return task
+
+    def _forget(self, user_key: tuple[int, ...], task: asyncio.Task):
+        if self.running.get(user_key) is task:
+            del self.running[user_key]
+
+
+generation_tracker = GenerationTracker()
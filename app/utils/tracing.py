@@ -0,0 +1,247 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config_reader import settings
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: list[Span] = []
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def render(self, origin: Optional[float] = None, depth: int = 0) -> list[str]:
+        origin = self.start if origin is None else origin
+        lines = [
+            f"{'  ' * depth}{self.name}: {self.duration_ms:.1f} ms "
+            f"(+{(self.start - origin) * 1000:.1f})"
+        ]
+        for child in self.children:
+            lines.extend(child.render(origin, depth + 1))
+        return lines
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_noop = nullcontext()
+
+
+class _SpanContext:
+    __slots__ = ("span", "token")
+
+    def __init__(self, parent: Span, name: str):
+        self.span = Span(name)
+        parent.children.append(self.span)
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.finish()
+        _current_span.reset(self.token)
+
+
+def span(name: str):
+    # Outside a traced update this is a shared no-op context manager.
+    parent = _current_span.get()
+    if parent is None:
+        return _noop
+    return _SpanContext(parent, name)
+
+
+def leaf_span(name: str) -> Optional[Span]:
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    child = Span(name)
+    parent.children.append(child)
+    return child
+
+
+def _stack_key(frame, limit: int = 12) -> str:
+    entries = []
+    while frame is not None and len(entries) < limit:
+        code = frame.f_code
+        entries.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    return "\n    ".join(entries)
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: dict[asyncio.Task, Counter[str]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="sampling-profiler",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.samples.clear()
+
+    def attach(self, task: asyncio.Task):
+        self.samples[task] = Counter()
+
+    def detach(self, task: asyncio.Task) -> Counter[str]:
+        return self.samples.pop(task, Counter())
+
+    def _run(self):
+        # Samples the event loop thread and charges the stack to the update
+        # whose task is running at that moment; time spent awaiting I/O
+        # shows up in spans instead.
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            task = asyncio.current_task(self.loop)
+            samples = self.samples.get(task)
+            if frame is None or samples is None:
+                continue
+            samples[_stack_key(frame)] += 1
+
+
+class Tracer:
+    def __init__(
+        self,
+        enabled: bool = False,
+        slow_ms: float = 2000,
+        profile_percent: float = 5,
+        history: int = 1000,
+    ):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.profile_percent = profile_percent
+        self.profiler = SamplingProfiler()
+        self.durations: deque[float] = deque(maxlen=history)
+
+    def begin(self, name: str) -> tuple[Span, Any]:
+        root = Span(name)
+        token = _current_span.set(root)
+        if self.profiler.running:
+            self.profiler.attach(asyncio.current_task())
+        return root, token
+
+    def end(self, root: Span, token: Any):
+        root.finish()
+        _current_span.reset(token)
+        samples = None
+        if self.profiler.running:
+            samples = self.profiler.detach(asyncio.current_task())
+
+        duration = root.duration_ms
+        self.durations.append(duration)
+        if duration >= self.slow_ms:
+            print("Slow update:\n" + "\n".join(root.render()))
+        if samples and self._is_slowest(duration):
+            hottest = "\n".join(
+                f"  {count} samples:\n    {stack}"
+                for stack, count in samples.most_common(5)
+            )
+            print(f"Hottest stacks for {root.name} ({duration:.1f} ms):\n{hottest}")
+
+    def _is_slowest(self, duration: float) -> bool:
+        if len(self.durations) < 20:
+            return False
+        ordered = sorted(self.durations)
+        index = int(len(ordered) * (1 - self.profile_percent / 100))
+        return duration >= ordered[min(index, len(ordered) - 1)]
+
+
+def instrument_sqlalchemy(*engines: Engine):
+    for engine in engines:
+        _instrument_engine(engine)
+
+
+def _instrument_engine(engine: Engine):
+    # The pool has no event before a checkout starts waiting, so the wait
+    # is timed around Engine.raw_connection, which every Connection (ORM
+    # flushes included) goes through; it survives pool recreation.
+    raw_connection = engine.raw_connection
+
+    def traced_raw_connection():
+        checkout = leaf_span("db.checkout")
+        try:
+            return raw_connection()
+        finally:
+            if checkout is not None:
+                checkout.finish()
+
+    engine.raw_connection = traced_raw_connection
+
+    @event.listens_for(engine, "do_connect")
+    def _before_connect(dialect, connection_record, cargs, cparams):
+        opening = leaf_span("db.connect")
+        if opening is not None:
+            connection_record.info["trace_connect"] = opening
+
+    @event.listens_for(engine, "connect")
+    def _after_connect(dbapi_connection, connection_record):
+        opening = connection_record.info.pop("trace_connect", None)
+        if opening is not None:
+            opening.finish()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_query(conn, cursor, statement, parameters, context, executemany):
+        query = leaf_span(f"db.query {' '.join(statement.split())[:60]}")
+        if query is not None:
+            conn.info.setdefault("trace_queries", []).append(query)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_query(conn, cursor, statement, parameters, context, executemany):
+        queries = conn.info.get("trace_queries")
+        if queries:
+            queries.pop().finish()
+
+    @event.listens_for(engine, "handle_error")
+    def _failed_query(exception_context):
+        connection = exception_context.connection
+        queries = connection.info.get("trace_queries") if connection else None
+        if queries:
+            queries.pop().finish()
+
+
+tracer = Tracer(
+    enabled=settings.trace_enabled,
+    slow_ms=settings.trace_slow_ms,
+    profile_percent=settings.profile_slowest_percent,
+)
@@ -0,0 +1,35 @@
+from collections import deque
+from typing import Optional
+
+from cachetools import TTLCache
+
+
+class VariantCache:
+    def __init__(self, maxsize: int = 10_000, ttl: float = 3600):
+        self.entries: TTLCache[tuple[int, int, int], deque[str]] = TTLCache(
+            maxsize=maxsize,
+            ttl=ttl
+        )
+
+    def put(
+        self,
+        tenant_id: int,
+        user_id: int,
+        message_id: int,
+        variants: list[str]
+    ):
+        if variants:
+            self.entries[(tenant_id, user_id, message_id)] = deque(variants)
+
+    def pop(self, tenant_id: int, user_id: int, message_id: int) -> Optional[str]:
+        key = (tenant_id, user_id, message_id)
+        variants = self.entries.get(key)
+        if not variants:
+            return None
+        variant = variants.popleft()
+        if not variants:
+            self.entries.pop(key, None)
+        return variant
+
+
+variant_cache = VariantCache()
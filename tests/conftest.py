@@ -0,0 +1,16 @@
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "app")
+sys.path.insert(0, APP_DIR)
+
+# Importing app modules builds Settings, which requires these
+for name, value in {
+    "BOT_TOKEN": "1:test",
+    "OPENAI_API_KEY": "test",
+    "DB_URL": "sqlite://",
+    "TG_CHANNEL_ID": "1",
+    "TG_CHANNEL_LINK": "test",
+    "PROVIDER_TOKEN": "",
+}.items():
+    os.environ.setdefault(name, value)
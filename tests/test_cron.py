@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import pytest
+
+from scheduler.cron import CronSchedule, parse_field
+
+
+def test_every_step():
+    assert parse_field("*/15", 0, 59) == {0, 15, 30, 45}
+
+
+def test_start_with_step():
+    assert parse_field("5/15", 0, 59) == {5, 20, 35, 50}
+
+
+def test_range_and_list():
+    assert parse_field("1-3,10-20/5", 0, 59) == {1, 2, 3, 10, 15, 20}
+
+
+def test_out_of_range():
+    with pytest.raises(ValueError):
+        parse_field("60", 0, 59)
+
+
+def test_next_after_step():
+    schedule = CronSchedule("*/15 * * * *")
+    assert schedule.next_after(datetime(2026, 1, 1, 10, 7)) == datetime(2026, 1, 1, 10, 15)
+    assert schedule.next_after(datetime(2026, 1, 1, 10, 45)) == datetime(2026, 1, 1, 11, 0)
+
+
+def test_day_of_month_or_day_of_week():
+    # Both day fields restricted: the 13th or any Friday
+    schedule = CronSchedule("0 9 13 * 5")
+    # 2026-02-06 is a Friday
+    assert schedule.next_after(datetime(2026, 2, 1)) == datetime(2026, 2, 6, 9, 0)
+    assert schedule.next_after(datetime(2026, 2, 10)) == datetime(2026, 2, 13, 9, 0)
+
+
+def test_day_of_week_only():
+    # Day of month is "*", so only Mondays match
+    schedule = CronSchedule("30 8 * * 1")
+    assert schedule.next_after(datetime(2026, 2, 3)) == datetime(2026, 2, 9, 8, 30)